@@ -1,8 +1,23 @@
 #!/usr/bin/env python3
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import time
+
+_PROCESS_START = time.perf_counter()
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import base64
+import cProfile
+import heapq
+import io
+import itertools
 import json
 import logging
 import os
+import pstats
+import random
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import sys
@@ -10,7 +25,8 @@ import sys
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from pdf_filler import GeneralPDFFiller
+# pdf_filler is cheap to import; it loads fitz on the first fill
+from pdf_filler import GeneralPDFFiller, MappingError, fitz_loaded
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,11 +35,379 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Import-time budget in milliseconds, checked by --startup-profile
+STARTUP_BUDGET_MS = 500
+
+def _windows_rss_bytes():
+    """Current working set size via GetProcessMemoryInfo"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(),
+                                                    ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+def _memory_usage():
+    """
+    Return {"rss_bytes": current} where the platform reports it, else
+    {"peak_rss_bytes": peak}, else {}
+    """
+    if sys.platform == 'win32':
+        try:
+            rss = _windows_rss_bytes()
+        except (OSError, AttributeError):
+            rss = None
+        return {"rss_bytes": rss} if rss is not None else {}
+    try:
+        with open('/proc/self/statm') as f:
+            return {"rss_bytes": int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')}
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return {}
+    # ru_maxrss is the peak, in bytes on macOS and kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"peak_rss_bytes": peak if sys.platform == 'darwin' else peak * 1024}
+
+class StackSampler(threading.Thread):
+    """
+    Low-overhead profiler: snapshots one thread's Python stack every interval.
+
+    Unlike cProfile it adds no per-call tracing; the sampled thread only pays
+    for the GIL switches when a sample is taken.
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_depth=40):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno}({code.co_name})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def report(self, top_n):
+        """Text summary: inclusive samples per function, then the most frequent stacks"""
+        functions = Counter()
+        for stack, count in self.stacks.items():
+            # Count each function once per stack, ignoring the line within it
+            for name in {entry.split(':')[0] + entry[entry.index('('):] for entry in stack}:
+                functions[name] += count
+
+        lines = [f"{self.samples} stack samples every {self.interval * 1000:g} ms", "",
+                 "Inclusive samples by function:"]
+        for name, count in functions.most_common(top_n):
+            lines.append(f"  {count:>6}  {count / max(self.samples, 1):6.1%}  {name}")
+        lines += ["", "Most frequent stacks (outermost first):"]
+        for stack, count in self.stacks.most_common(10):
+            lines.append(f"  {count:>6}  " + " -> ".join(stack))
+        return "\n".join(lines)
+
+class RequestProfiler:
+    """
+    Opt-in profile capture for fill requests.
+
+    A fill is traced with cProfile when the request passes "profile": true or
+    is picked by sample_rate (0.0 - 1.0). If slow_ms is set, every other fill
+    runs under a StackSampler and the result is kept only when the fill took
+    longer than slow_ms, so catching slow requests does not put deterministic
+    tracing on every fill. The newest max_profiles results are kept in memory
+    with their request metadata.
+    """
+
+    def __init__(self, sample_rate=0.0, slow_ms=None, max_profiles=50, top_n=40):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_profiles = max_profiles
+        self.top_n = top_n
+        self._profiles = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def run(self, method, params, func):
+        """Call func(), profiling it if this request qualifies"""
+        requested = bool(params.get('profile'))
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if requested or sampled:
+            profiler = cProfile.Profile()
+        elif self.slow_ms is not None:
+            profiler = StackSampler(threading.get_ident())
+        else:
+            return func()
+
+        error = None
+        start = time.perf_counter()
+        if isinstance(profiler, StackSampler):
+            profiler.start()
+        else:
+            profiler.enable()
+        try:
+            return func()
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            if isinstance(profiler, StackSampler):
+                profiler.stop()
+            else:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if requested or sampled:
+                reason = "requested" if requested else "sampled"
+                self._store("cprofile", self._cprofile_stats(profiler), method, params, elapsed_ms, reason, error)
+            elif elapsed_ms >= self.slow_ms:
+                self._store("stack_sampling", profiler.report(self.top_n), method, params, elapsed_ms, "slow", error)
+
+    def _cprofile_stats(self, profiler):
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(self.top_n)
+        return stream.getvalue()
+
+    def _store(self, kind, stats, method, params, elapsed_ms, reason, error):
+        with self._lock:
+            profile_id = next(self._ids)
+            self._profiles[profile_id] = {
+                "profile_id": profile_id,
+                "method": method,
+                "target_id": params.get('target_id'),
+                "reason": reason,
+                "profiler": kind,
+                "elapsed_ms": round(elapsed_ms, 2),
+                "error": error,
+                "timestamp": datetime.now().isoformat(),
+                "stats": stats
+            }
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        logger.info(f"Stored profile {profile_id} for {method} ({reason}, {elapsed_ms:.1f} ms)")
+
+    def list(self):
+        with self._lock:
+            return [{k: v for k, v in entry.items() if k != 'stats'}
+                    for entry in self._profiles.values()]
+
+    def get(self, profile_id):
+        with self._lock:
+            entry = self._profiles.get(int(profile_id))
+        if entry is None:
+            raise ValueError(f"Profile not found: {profile_id}")
+        return entry
+
+# JSON-RPC error code returned when a client is over its rate budget
+RATE_LIMITED = -32029
+
+class RateLimitExceeded(Exception):
+    def __init__(self, key, retry_after):
+        super().__init__(f"Rate limit exceeded for {key}; retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+class FairScheduler:
+    """
+    Admission control and weighted fair queuing in front of fill execution.
+
+    Each client key has a token bucket (rate tokens/second, up to burst); a
+    request arriving with an empty bucket is rejected with RateLimitExceeded
+    instead of queued. Admitted requests wait in a single queue ordered by
+    virtual finish time, so a client flooding the server only delays its own
+    later requests. At most max_concurrent fills run at once; PyMuPDF is not
+    thread-safe, so this stays at 1 unless fills move to separate processes.
+
+    Keys are only as good as the client_id clients send: without one, every
+    local client shares its remote address, and a client rotating ids gets a
+    fresh bucket per id. To bound that, at most max_clients keys are tracked.
+    A key idle for idle_expiry seconds can be replaced by a new one; when none
+    can, new keys share the OVERFLOW_KEY bucket and queue position.
+    """
+
+    OVERFLOW_KEY = "(overflow)"
+
+    def __init__(self, rate=None, burst=10, weights=None, max_concurrent=1, max_clients=256, idle_expiry=300.0):
+        weights = weights or {}
+        for key, weight in weights.items():
+            if weight <= 0:
+                raise ValueError(f"Weight for {key} must be positive, got {weight}")
+        self.rate = rate
+        self.burst = burst
+        self.weights = weights
+        self.max_concurrent = max_concurrent
+        self.max_clients = max_clients
+        self.idle_expiry = idle_expiry
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_seen = OrderedDict()
+        self._last_finish = {}
+        self._buckets = {}
+        self._stats = {}
+
+    def _track(self, key):
+        """Return the key to account under, expiring an idle key if the table is full"""
+        now = time.monotonic()
+        if key not in self._last_seen and len(self._last_seen) >= self.max_clients:
+            expired = next((old for old, seen in self._last_seen.items()
+                            if now - seen >= self.idle_expiry and old != self.OVERFLOW_KEY
+                            and not self._stats.get(old, {}).get("queued")
+                            and not self._stats.get(old, {}).get("running")), None)
+            if expired is None:
+                key = self.OVERFLOW_KEY
+            else:
+                for table in (self._last_seen, self._last_finish, self._buckets, self._stats):
+                    table.pop(expired, None)
+        self._last_seen[key] = now
+        self._last_seen.move_to_end(key)
+        return key
+
+    def _client_stats(self, key):
+        return self._stats.setdefault(key, {
+            "queued": 0, "running": 0, "served": 0, "rejected": 0,
+            "total_wait_ms": 0.0, "max_wait_ms": 0.0
+        })
+
+    def _take_token(self, key):
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self._client_stats(key)["rejected"] += 1
+            raise RateLimitExceeded(key, (1 - tokens) / self.rate)
+        self._buckets[key] = (tokens - 1, now)
+
+    def admit(self, key):
+        """Charge key's token bucket without queuing; raises RateLimitExceeded when over budget"""
+        with self._cond:
+            self._take_token(self._track(key))
+
+    def run(self, key, func):
+        """Run func() once it is key's turn; raises RateLimitExceeded when over budget"""
+        enqueued = time.perf_counter()
+        with self._cond:
+            key = self._track(key)
+            self._take_token(key)
+            stats = self._client_stats(key)
+            weight = self.weights.get(key, 1.0)
+            finish = max(self._virtual_time, self._last_finish.get(key, 0.0)) + 1.0 / weight
+            self._last_finish[key] = finish
+            entry = (finish, next(self._seq))
+            heapq.heappush(self._heap, entry)
+            stats["queued"] += 1
+
+            while self._active >= self.max_concurrent or self._heap[0] is not entry:
+                self._cond.wait()
+
+            heapq.heappop(self._heap)
+            self._active += 1
+            self._virtual_time = finish
+            wait_ms = (time.perf_counter() - enqueued) * 1000
+            stats["queued"] -= 1
+            stats["running"] += 1
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+        try:
+            return func()
+        finally:
+            with self._cond:
+                self._active -= 1
+                stats["running"] -= 1
+                stats["served"] += 1
+                self._cond.notify_all()
+
+    def stats(self):
+        """Queue depth and wait times per client key"""
+        with self._cond:
+            clients = {}
+            for key, stats in self._stats.items():
+                started = stats["served"] + stats["running"]
+                avg_wait_ms = stats["total_wait_ms"] / started if started else 0.0
+                clients[key] = dict(stats,
+                                    total_wait_ms=round(stats["total_wait_ms"], 2),
+                                    max_wait_ms=round(stats["max_wait_ms"], 2),
+                                    avg_wait_ms=round(avg_wait_ms, 2))
+            return {"queue_depth": len(self._heap), "running": self._active, "clients": clients}
+
 class JSONRPCHandler(BaseHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        self.pdf_filler = GeneralPDFFiller()
-        super().__init__(*args, **kwargs)
-    
+    _pdf_filler = None
+    _pdf_filler_lock = threading.Lock()
+    profiler = RequestProfiler()
+    scheduler = FairScheduler()
+    # Scheduler key: "client" (client_id param, else remote address) or "target_id"
+    fair_key = "client"
+    # Previews render in their own processes so they never hold the fill slot
+    preview_workers = 2
+    _render_pool = None
+
+    @property
+    def pdf_filler(self):
+        # One filler shared by all connections, created on the first fill
+        with JSONRPCHandler._pdf_filler_lock:
+            if JSONRPCHandler._pdf_filler is None:
+                JSONRPCHandler._pdf_filler = GeneralPDFFiller()
+        return JSONRPCHandler._pdf_filler
+
+    @property
+    def render_pool(self):
+        with JSONRPCHandler._pdf_filler_lock:
+            if JSONRPCHandler._render_pool is None:
+                JSONRPCHandler._render_pool = ProcessPoolExecutor(max_workers=self.preview_workers)
+        return JSONRPCHandler._render_pool
+
+    def scheduler_key(self, params):
+        if self.fair_key == "target_id":
+            return str(params.get('target_id'))
+        return str(params.get('client_id') or self.client_address[0])
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/health':
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(self.health()).encode('utf-8'))
+
     def do_POST(self):
         try:
             content_length = int(self.headers['Content-Length'])
@@ -60,7 +444,7 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
     
@@ -71,7 +455,20 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
         
         try:
             if method == 'fillPDFForm':
-                result = self.fill_pdf_form(params)
+                result = self.scheduler.run(
+                    self.scheduler_key(params),
+                    lambda: self.profiler.run(method, params, lambda: self.fill_pdf_form(params))
+                )
+            elif method == 'renderPreview':
+                # Rate limited like fills, but rendered outside the fill queue
+                self.scheduler.admit(self.scheduler_key(params))
+                result = self.render_preview(params)
+            elif method == 'health':
+                result = self.health()
+            elif method == 'getProfiles':
+                result = self.get_profiles(params)
+            elif method == 'getSchedulerStats':
+                result = self.scheduler.stats()
             else:
                 raise ValueError(f"Unknown method: {method}")
             
@@ -80,6 +477,28 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
                 "result": result,
                 "id": request_id
             }
+        except MappingError as e:
+            logger.error(f"Refusing mapping in {method}: {str(e)}")
+            return {
+                "jsonrpc": "2.0",
+                "error": {
+                    "code": -32000,
+                    "message": str(e),
+                    "data": {"issues": e.issues}
+                },
+                "id": request_id
+            }
+        except RateLimitExceeded as e:
+            logger.warning(str(e))
+            return {
+                "jsonrpc": "2.0",
+                "error": {
+                    "code": RATE_LIMITED,
+                    "message": str(e),
+                    "data": {"retry_after": round(e.retry_after, 3)}
+                },
+                "id": request_id
+            }
         except Exception as e:
             logger.error(f"Error in {method}: {str(e)}")
             return {
@@ -91,11 +510,23 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
                 "id": request_id
             }
     
-    def fill_pdf_form(self, params):
-        target_id = params.get('target_id')
-        form_data = params.get('form_data', {})
-        conditions = params.get('conditions', [])
-        
+    def health(self):
+        """Report liveness without importing PyMuPDF"""
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.perf_counter() - _PROCESS_START, 3),
+            **_memory_usage(),
+            "fitz_loaded": fitz_loaded()
+        }
+
+    def get_profiles(self, params):
+        """List stored profiles, or fetch one by profile_id"""
+        if params.get('profile_id') is not None:
+            return self.profiler.get(params['profile_id'])
+        return {"profiles": self.profiler.list()}
+
+    def target_files(self, target_id):
+        """Return (pdf_template, mapping_file) for a target, checking both exist"""
         if not target_id:
             raise ValueError("target_id is required")
         
@@ -112,24 +543,73 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
         if not mapping_file.exists():
             raise FileNotFoundError(f"Mapping file not found: {mapping_file}")
         
+        return pdf_template, mapping_file
+    
+    def render_preview(self, params):
+        """
+        Rasterize pages of a filled output ("output_path"), or fill "target_id"
+        in memory and render it without saving. Optional "pages" (0-based,
+        default [0]), "dpi" (default 100) and "format" ("png" or "jpeg").
+        """
+        pages = params.get('pages')
+        dpi = params.get('dpi', 100)
+        image_format = params.get('format', 'png')
+        
+        if params.get('output_path'):
+            output_root = (Path(__file__).parent / "output").resolve()
+            output_path = Path(params['output_path']).resolve()
+            if output_root not in output_path.parents:
+                raise ValueError("output_path must be inside the output directory")
+            if not output_path.exists():
+                raise FileNotFoundError(f"Output not found: {output_path}")
+            images = self.pdf_filler.render_output(str(output_path), pages, dpi, image_format,
+                                                   executor=self.render_pool)
+        else:
+            pdf_template, mapping_file = self.target_files(params.get('target_id'))
+            images = self.pdf_filler.render_filled(
+                str(pdf_template),
+                str(mapping_file),
+                params.get('form_data', {}),
+                params.get('conditions', []),
+                pages, dpi, image_format,
+                executor=self.render_pool
+            )
+        
+        return {
+            "format": image_format,
+            "dpi": dpi,
+            "pages": [
+                {"page": page_num, "data": base64.b64encode(image).decode('ascii')}
+                for page_num, image in images
+            ]
+        }
+    
+    def fill_pdf_form(self, params):
+        target_id = params.get('target_id')
+        form_data = params.get('form_data', {})
+        conditions = params.get('conditions', [])
+        save_profile = params.get('save_profile')
+        
+        pdf_template, mapping_file = self.target_files(target_id)
+        
         # Create target-specific output directory
         output_dir = Path(__file__).parent / "output" / target_id
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Generate output filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Generate output filename with timestamp; microseconds keep
+        # concurrent fills of the same target from overwriting each other
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         output_filename = f"{target_id}_{timestamp}.pdf"
         
-        # Update pdf_filler to use target-specific directory
-        self.pdf_filler.output_dir = output_dir
-        
-        # Fill the PDF
+        # Fill the PDF into the target-specific directory
         output_path = self.pdf_filler.fill_pdf(
             str(pdf_template),
             str(mapping_file),
             form_data,
             conditions,
-            output_filename
+            output_filename,
+            save_profile=save_profile,
+            output_dir=output_dir
         )
         
         return {
@@ -143,11 +623,65 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
         # Override to use our logger
         logger.info(f"{self.address_string()} - {format % args}")
 
+def _import_times(statement):
+    """Run statement under `python -X importtime`; returns (depth, module, self ms, cumulative ms) rows"""
+    import subprocess
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+def startup_profile():
+    """
+    Print how long importing the server takes, module by module, against STARTUP_BUDGET_MS
+
+    Imports are timed in a fresh interpreter. A module imported by several
+    others is counted under the first one, as -X importtime does. fitz is
+    timed after the server, since it is loaded by the first fill.
+    """
+    rows = _import_times("import json_rpc_server, fitz")
+    times = {name: (self_ms, cumulative_ms) for depth, name, self_ms, cumulative_ms in rows if depth == 0}
+    # -X importtime lists a module's imports just before the module itself
+    server_index = next(i for i, row in enumerate(rows) if row[0] == 0 and row[1] == 'json_rpc_server')
+    children = []
+    for depth, name, _, cumulative_ms in reversed(rows[:server_index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative_ms))
+    children.sort(key=lambda child: -child[1])
+
+    server_self_ms, import_ms = times['json_rpc_server']
+    shown = [child for child in children if child[1] >= 1.0]
+    rest = children[len(shown):]
+    print("Import-time breakdown of json_rpc_server:")
+    for name, ms in shown:
+        print(f"  {name:<28} {ms:8.1f} ms")
+    if rest:
+        print(f"  {f'other ({len(rest)} modules)':<28} {sum(ms for _, ms in rest):8.1f} ms")
+    print(f"  {'json_rpc_server itself':<28} {server_self_ms:8.1f} ms")
+    status = "OK" if import_ms <= STARTUP_BUDGET_MS else "OVER BUDGET"
+    print(f"Time to import json_rpc_server: {import_ms:.1f} ms (budget {STARTUP_BUDGET_MS} ms) - {status}")
+    if 'fitz' in times:
+        print(f"Deferred to the first fill: fitz {times['fitz'][1]:.1f} ms")
+    return import_ms <= STARTUP_BUDGET_MS
+
 def run_server(port=8080):
     server_address = ('localhost', port)
-    httpd = HTTPServer(server_address, JSONRPCHandler)
+    # Threaded so queued fills don't block accepting other clients; the
+    # FairScheduler decides which fill runs next
+    httpd = ThreadingHTTPServer(server_address, JSONRPCHandler)
     
-    logger.info(f"General Form JSON-RPC Server running on http://localhost:{port}")
+    startup_ms = (time.perf_counter() - _PROCESS_START) * 1000
+    logger.info(f"General Form JSON-RPC Server running on http://localhost:{port} (started in {startup_ms:.0f} ms)")
     logger.info("Press Ctrl+C to stop")
     
     try:
@@ -155,6 +689,49 @@ def run_server(port=8080):
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
         httpd.shutdown()
+        if JSONRPCHandler._render_pool is not None:
+            JSONRPCHandler._render_pool.shutdown(cancel_futures=True)
+
+def client_weight(value):
+    """argparse type for --client-weight KEY=WEIGHT with WEIGHT > 0"""
+    key, _, weight = value.rpartition('=')
+    try:
+        weight = float(weight)
+    except ValueError:
+        weight = None
+    if not key or weight is None or weight <= 0:
+        raise argparse.ArgumentTypeError(f"expected KEY=WEIGHT with a positive weight, got '{value}'")
+    return key, weight
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="General Form JSON-RPC Server")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Print an import-time breakdown and exit")
+    parser.add_argument('--profile-sample-rate', type=float, default=0.0,
+                        help="Fraction of fills to trace with cProfile (0.0 - 1.0); "
+                             "traced fills run noticeably slower")
+    parser.add_argument('--profile-slow-ms', type=float, default=None,
+                        help="Keep stack-sampled profiles of fills slower than this many ms "
+                             "(low overhead; a sampler thread runs during every fill)")
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help="Fill requests per second allowed per client (default: unlimited)")
+    parser.add_argument('--burst', type=int, default=10,
+                        help="Token bucket size per client")
+    parser.add_argument('--fair-key', choices=['client', 'target_id'], default='client',
+                        help="Schedule and rate limit per client or per target_id")
+    parser.add_argument('--preview-workers', type=int, default=2,
+                        help="Processes used to render previews")
+    parser.add_argument('--client-weight', action='append', default=[], metavar='KEY=WEIGHT', type=client_weight,
+                        help="Fair-queuing weight for a client key (repeatable)")
+    args = parser.parse_args()
+
+    weights = dict(args.client_weight)
+    JSONRPCHandler.scheduler = FairScheduler(args.rate_limit, args.burst, weights)
+    JSONRPCHandler.fair_key = args.fair_key
+    JSONRPCHandler.preview_workers = args.preview_workers
+    JSONRPCHandler.profiler = RequestProfiler(args.profile_sample_rate, args.profile_slow_ms)
+
+    if args.startup_profile:
+        sys.exit(0 if startup_profile() else 1)
+    run_server(args.port)
\ No newline at end of file
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for json_rpc_server.
+
+Replays JSON-RPC requests from a JSONL file or synthesizes fillPDFForm calls
+for a target, at a fixed arrival rate. A replay file holds one request per
+line, as sent to the server:
+
+    {"jsonrpc": "2.0", "method": "fillPDFForm", "params": {"target_id": "form", "form_data": {}}}
+
+"id" is optional and replaced on send; blank lines are ignored. Latency is measured from each request's
+scheduled send time, so a slow server shows up as latency instead of a lower
+send rate. With --ramp the rate is stepped up until the server saturates.
+
+    python load_generator.py --target-id form --rate 5 --duration 30
+    python load_generator.py --replay traffic.jsonl --rate 2 --ramp --max-rate 50
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+def load_replay(path):
+    """Read JSON-RPC request objects from a JSONL file; any other line is an error"""
+    requests = []
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            request = json.loads(line)
+            if isinstance(request, dict) and request.get('method'):
+                requests.append(request)
+            elif isinstance(request, dict) and {'request_id', 'title', 'body'} <= request.keys():
+                raise ValueError(f"{path}:{line_number} is a change-request record, not a JSON-RPC "
+                                 f"request; replay files hold one {{\"jsonrpc\", \"method\", \"params\"}} "
+                                 f"object per line")
+            else:
+                raise ValueError(f"{path}:{line_number} is not a JSON-RPC request object with a \"method\"")
+    if not requests:
+        raise ValueError(f"No JSON-RPC requests found in {path}")
+    return requests
+
+def synthesize(target_id):
+    """Build a fillPDFForm request filling every mapped field with its own name"""
+    mapping_file = Path(__file__).parent / "blanks_and_json" / f"{target_id}.json"
+    with open(mapping_file, 'r') as f:
+        mapping = json.load(f)
+    return [{
+        "jsonrpc": "2.0",
+        "method": "fillPDFForm",
+        "params": {
+            "target_id": target_id,
+            "form_data": {name: name for name in mapping.get('fields', {})},
+            "conditions": list(mapping.get('condition_boxes', {}))
+        }
+    }]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def post(url, request, timeout):
+    """Send one request and classify the reply as ok, rate_limited or error; transport errors raise"""
+    body = json.dumps(request).encode('utf-8')
+    http_request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        reply = json.loads(response.read().decode('utf-8'))
+    error = reply.get('error') if isinstance(reply, dict) else "malformed reply"
+    if error is None:
+        return "ok"
+    return "rate_limited" if isinstance(error, dict) and error.get('code') == -32029 else "error"
+
+class RSSSampler(threading.Thread):
+    """
+    Poll the server's /health endpoint for memory once per interval
+
+    Uses rss_bytes when the server reports it; on platforms that only give
+    peak_rss_bytes the samples are peaks, and `kind` says so.
+    """
+
+    def __init__(self, url, interval=1.0):
+        super().__init__(daemon=True)
+        self.url = url.rstrip('/') + '/health'
+        self.interval = interval
+        self.samples = []
+        self.kind = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        while not self._stopped.is_set():
+            try:
+                with urllib.request.urlopen(self.url, timeout=self.interval) as response:
+                    health = json.loads(response.read().decode('utf-8'))
+                for kind in ('rss_bytes', 'peak_rss_bytes'):
+                    if health.get(kind) is not None:
+                        self.kind = kind
+                        self.samples.append((round(time.perf_counter() - start, 1), health[kind]))
+                        break
+            except Exception:
+                pass
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+def run_step(url, requests, rate, duration, concurrency, timeout):
+    """Send requests at `rate` per second for `duration` seconds and summarize the results"""
+    results = []
+    lock = threading.Lock()
+    ids = itertools.count(1)
+
+    def send(request, scheduled):
+        # Anything that goes wrong (connection errors, IncompleteRead, bad
+        # JSON) counts as an error; an exception here would be lost in the future
+        try:
+            outcome = post(url, dict(request, id=next(ids)), timeout)
+        except Exception:
+            outcome = "error"
+        latency_ms = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            results.append((outcome, latency_ms))
+
+    total = max(1, int(rate * duration))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, request in zip(range(total), itertools.cycle(requests)):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, request, scheduled)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for outcome, latency in results if outcome == "ok")
+    errors = sum(1 for outcome, _ in results if outcome == "error")
+    rate_limited = sum(1 for outcome, _ in results if outcome == "rate_limited")
+    return {
+        "offered_rate": rate,
+        "sent": len(results),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p90_ms": round(percentile(latencies, 90), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "rate_limited": rate_limited
+    }
+
+def saturated(step, slo_ms, max_error_rate):
+    """A step is saturated when p99 breaks the SLO, errors climb, or throughput falls behind the offered rate"""
+    return (step["p99_ms"] > slo_ms
+            or step["error_rate"] > max_error_rate
+            or step["throughput"] < 0.9 * step["offered_rate"])
+
+def print_step(step):
+    print(f"rate {step['offered_rate']:>7.2f}/s  sent {step['sent']:>6}  "
+          f"throughput {step['throughput']:>7.2f}/s  "
+          f"p50 {step['p50_ms']:>8.1f}  p90 {step['p90_ms']:>8.1f}  p99 {step['p99_ms']:>8.1f}  "
+          f"max {step['max_ms']:>8.1f} ms  errors {step['error_rate']:.2%}  "
+          f"rate-limited {step['rate_limited']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for json_rpc_server")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--replay', help="JSONL file with one JSON-RPC request object per line")
+    source.add_argument('--target-id', help="Synthesize fillPDFForm requests for this target")
+    parser.add_argument('--url', default="http://localhost:8080")
+    parser.add_argument('--rate', type=float, default=1.0, help="Requests per second (start rate with --ramp)")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds per run or ramp step")
+    parser.add_argument('--concurrency', type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--ramp', action='store_true', help="Step the rate up until the server saturates")
+    parser.add_argument('--rate-step', type=float, default=1.5, help="Rate multiplier per ramp step")
+    parser.add_argument('--max-rate', type=float, default=100.0)
+    parser.add_argument('--slo-ms', type=float, default=5000.0, help="p99 latency that counts as saturated")
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    try:
+        requests = load_replay(args.replay) if args.replay else synthesize(args.target_id)
+    except ValueError as e:
+        parser.error(str(e))
+    sampler = RSSSampler(args.url)
+    sampler.start()
+
+    rate = args.rate
+    last_good = None
+    try:
+        while True:
+            step = run_step(args.url, requests, rate, args.duration, args.concurrency, args.timeout)
+            print_step(step)
+            if not args.ramp:
+                break
+            if saturated(step, args.slo_ms, args.max_error_rate):
+                print(f"Saturated at {rate:.2f}/s; last sustainable rate: "
+                      f"{f'{last_good:.2f}/s' if last_good else 'none'}")
+                break
+            last_good = rate
+            if rate >= args.max_rate:
+                print(f"Reached --max-rate {args.max_rate}/s without saturating")
+                break
+            rate = min(rate * args.rate_step, args.max_rate)
+    finally:
+        sampler.stop()
+
+    if sampler.samples:
+        label = "Server RSS" if sampler.kind == 'rss_bytes' else "Server peak RSS"
+        values = [rss for _, rss in sampler.samples]
+        print(f"{label}: min {min(values) / 2**20:.1f} MB  max {max(values) / 2**20:.1f} MB  "
+              f"last {values[-1] / 2**20:.1f} MB  ({len(values)} samples)")
+        for elapsed, rss in sampler.samples:
+            print(f"  {elapsed:>7.1f}s  {rss / 2**20:8.1f} MB")
+    else:
+        print("Server RSS: not reported by /health")
+
+if __name__ == "__main__":
+    main()
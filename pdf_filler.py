@@ -1,23 +1,515 @@
 #!/usr/bin/env python3
-import fitz
+import argparse
+import hashlib
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# PyMuPDF is imported on first use so the server can start (and answer
+# health checks) without paying for the fitz import
+fitz = None
+
+def _load_fitz():
+    """Import PyMuPDF once and return the module"""
+    global fitz
+    if fitz is None:
+        import fitz as _fitz
+        fitz = _fitz
+    return fitz
+
+def fitz_loaded():
+    """Return True once PyMuPDF has been imported"""
+    return fitz is not None
+
+# Options passed to Document.save(); "subset_fonts" runs Document.subset_fonts()
+# first. Chosen per request, else per target via the mapping's "save_profile".
+# "max" needs PyMuPDF >= 1.22 (use_objstms) and fontTools for subset_fonts().
+SAVE_PROFILES = {
+    "default": {},
+    "compact": {"garbage": 3, "deflate": True},
+    "max": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True,
+            "use_objstms": 1, "subset_fonts": True},
+}
+
+# Extra TrueType fonts tried before the built-in ones, e.g. for names outside
+# Latin-1; os.pathsep-separated paths. A mapping may add its own "fonts" list.
+FONT_FILES_ENV = "PDF_FILLER_FONTS"
+# Built-in fonts always appended to the chain: Helvetica, then Droid Sans Fallback (CJK)
+BUILTIN_FONTS = ("helv", "cjk")
+MIN_FONT_SIZE = 4
+FONT_SIZE_STEP = 0.5
+
+_fonts = {}
+_font_chains = {}
+_fonts_lock = threading.Lock()
+
+def _get_font(spec):
+    """Load a fitz.Font once per process; spec is a built-in name or a font file path"""
+    with _fonts_lock:
+        font = _fonts.get(spec)
+        if font is None:
+            fitz = _load_fitz()
+            font = fitz.Font(spec) if spec in BUILTIN_FONTS else fitz.Font(fontfile=spec)
+            _fonts[spec] = font
+        return font
+
+def get_font_chain(font_files=()):
+    """Return the process-wide FontChain for these font files followed by the built-ins"""
+    specs = tuple(str(Path(f).resolve()) for f in font_files) + BUILTIN_FONTS
+    with _fonts_lock:
+        chain = _font_chains.get(specs)
+    if chain is None:
+        base14 = {i for i, spec in enumerate(specs) if spec == 'helv'}
+        chain = FontChain([_get_font(spec) for spec in specs], base14)
+        with _fonts_lock:
+            chain = _font_chains.setdefault(specs, chain)
+    return chain
+
+def _winansi(char):
+    """True if base-14 text (WinAnsiEncoding, i.e. cp1252) can show the character"""
+    try:
+        char.encode('cp1252')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+class FontChain:
+    """
+    Ordered fonts with cached per-character font choice and advance width.
+
+    Each character is drawn with the first font that has a glyph for it, so
+    text mixing scripts is split into runs. Widths are per point of font size.
+    Fonts listed in `base14` are drawn as the non-embedded base-14 font for
+    characters its WinAnsi (cp1252) encoding can show; their other glyphs are
+    drawn from the same font embedded, before any later font is tried.
+    """
+
+    def __init__(self, fonts, base14=()):
+        self.fonts = fonts
+        self.base14 = frozenset(base14)
+        primary = fonts[0]
+        self.line_height = primary.ascender - primary.descender
+        self.ascender = primary.ascender
+        self._glyphs = {}
+        self._lock = threading.Lock()
+
+    def glyph(self, char):
+        """Return (font index, advance width, drawn as base-14) for a character"""
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            code = ord(char)
+            index = next((i for i, font in enumerate(self.fonts) if font.has_glyph(code)), 0)
+            font = self.fonts[index]
+            # Characters no font has fall back to index 0 and are drawn as is
+            base14 = index in self.base14 and (not font.has_glyph(code) or (code >= 32 and _winansi(char)))
+            glyph = (index, font.glyph_advance(code), base14)
+            with self._lock:
+                self._glyphs[char] = glyph
+        return glyph
+
+    def width(self, text):
+        return sum(self.glyph(char)[1] for char in text)
+
+    def wrap(self, text, max_width):
+        """Greedy word wrap to max_width (in units per point); words wider than a line are broken"""
+        lines = []
+        space = self.width(' ')
+        for paragraph in text.split('\n'):
+            line, line_width = '', 0.0
+            for word in paragraph.split(' '):
+                word_width = self.width(word)
+                if line and line_width + space + word_width <= max_width:
+                    line, line_width = f"{line} {word}", line_width + space + word_width
+                    continue
+                if line:
+                    lines.append(line)
+                while word_width > max_width and len(word) > 1:
+                    cut, cut_width = 1, self.glyph(word[0])[1]
+                    while cut < len(word) and cut_width + self.glyph(word[cut])[1] <= max_width:
+                        cut_width += self.glyph(word[cut])[1]
+                        cut += 1
+                    lines.append(word[:cut])
+                    word, word_width = word[cut:], word_width - cut_width
+                line, line_width = word, word_width
+            lines.append(line)
+        return lines
+
+    def ellipsize(self, line, max_width):
+        """Shorten a line until it fits with a trailing ellipsis"""
+        while line and self.width(line + "...") > max_width:
+            line = line[:-1]
+        return line + "..."
+
+    def runs(self, line):
+        """Split a line into (font, text, width per point, base-14) runs sharing one font"""
+        runs = []
+        for char in line:
+            index, advance, base14 = self.glyph(char)
+            # A run already embedding this font keeps its base-14 characters
+            # (spaces, punctuation) so the text stays in one piece
+            if runs and runs[-1][0] in ((index, base14), (index, False)):
+                runs[-1][1].append(char)
+                runs[-1][2] += advance
+            else:
+                runs.append([(index, base14), [char], advance])
+        return [(self.fonts[index], ''.join(chars), width, base14)
+                for (index, base14), chars, width in runs]
+
+class MappingCache:
+    """
+    Per-process LRU of compiled mappings, used by every fill in the process.
+
+    Mappings are held in compiled form (see compile_mapping), are only
+    accepted if they pass lint_mapping against their template, and are
+    reloaded when either file changes on disk. At most max_mappings are kept,
+    least recently used first out.
+
+    Template PDFs are not cached; fills open them by path, and MuPDF reads
+    only the objects it needs, so template bytes sit in the OS page cache
+    rather than in each process. Each process (including preview workers)
+    keeps its own cache; compiled mappings are small.
+    """
+
+    def __init__(self, max_mappings=64):
+        self.max_mappings = max_mappings
+        self._mappings = OrderedDict()  # path -> (stamp, compiled mapping dict)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load_mapping(self, pdf_template, mapping_file):
+        """
+        Return the compiled mapping for a template; callers must treat it as read-only
+        
+        Raises MappingError if the mapping fails lint checks.
+        """
+        path = str(mapping_file)
+        stamp = (self._stamp(path), self._stamp(pdf_template))
+        with self._lock:
+            entry = self._mappings.get(path)
+            if entry and entry[0] == stamp:
+                self._mappings.move_to_end(path)
+                return entry[1]
+
+        mapping = load_compiled_mapping(pdf_template, path)
+        with self._lock:
+            self._mappings[path] = (stamp, mapping)
+            self._mappings.move_to_end(path)
+            while len(self._mappings) > self.max_mappings:
+                self._mappings.popitem(last=False)
+        return mapping
+
+    def clear(self):
+        with self._lock:
+            self._mappings.clear()
+
+# Coordinates may stray this far (in points) past the page edge before lint fails
+BOUNDS_TOLERANCE = 0.5
+# Same-kind boxes must overlap deeper than this (in points, on both axes) to fail lint
+OVERLAP_TOLERANCE = 1.0
+COMPILED_VERSION = 1
+
+class MappingError(ValueError):
+    def __init__(self, mapping_file, issues):
+        errors = [issue for issue in issues if issue['level'] == 'error']
+        summary = "; ".join(issue['message'] for issue in errors[:5])
+        more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+        super().__init__(f"Mapping {Path(mapping_file).name} failed lint: {summary}{more}")
+        self.mapping_file = mapping_file
+        self.issues = issues
+
+    def __reduce__(self):
+        # Rebuild from the original arguments when passed back from a worker process
+        return (self.__class__, (self.mapping_file, self.issues))
+
+def compiled_path(mapping_file):
+    """Path of the compiled runtime form written next to a mapping"""
+    mapping_file = Path(mapping_file)
+    return mapping_file.with_name(f"{mapping_file.stem}.compiled.json")
+
+def page_sizes(pdf_template):
+    """Return (width, height) of every page in a template"""
+    pdf_document = _load_fitz().open(pdf_template)
+    try:
+        return [(page.rect.width, page.rect.height) for page in pdf_document]
+    finally:
+        pdf_document.close()
+
+def find_overlaps(boxes):
+    """
+    Return pairs of boxes whose areas intersect; touching edges do not count
+    
+    boxes are (label, page, x1, y1, x2, y2). A sweep over x keeps only boxes
+    still open at the current left edge, so only those are tested on y.
+    """
+    overlaps = []
+    for page in {box[1] for box in boxes}:
+        active = []
+        for box in sorted((b for b in boxes if b[1] == page), key=lambda b: b[2]):
+            active = [other for other in active if other[4] > box[2]]
+            for other in active:
+                if other[3] < box[5] and box[3] < other[5]:
+                    overlaps.append((other, box))
+            active.append(box)
+    return overlaps
+
+def lint_mapping(mapping, sizes):
+    """
+    Check a mapping against its template's page sizes; returns a list of issues
+    
+    Malformed entries, pages that don't exist, zero-area or inverted boxes,
+    boxes outside the page and overlaps between two fields or two condition
+    boxes are errors. Overlaps no deeper than OVERLAP_TOLERANCE, a field
+    overlapping a condition box, and field_numbers pointing at missing fields
+    are warnings.
+    """
+    issues = []
+    boxes = []
+    
+    def issue(level, kind, message):
+        issues.append({"level": level, "kind": kind, "message": message})
+    
+    for section, label in (('fields', 'field'), ('condition_boxes', 'condition')):
+        for key, info in mapping.get(section, {}).items():
+            name = f"{label} '{key}'"
+            try:
+                x1, y1, x2, y2 = [float(v) for v in info['coordinates']]
+                page = int(info['page'])
+            except (KeyError, TypeError, ValueError):
+                issue('error', 'malformed', f"{name} has missing or invalid coordinates/page")
+                continue
+            if not 0 <= page < len(sizes):
+                issue('error', 'page', f"{name} is on page {page} but the template has {len(sizes)} pages")
+                continue
+            if x2 <= x1 or y2 <= y1:
+                issue('error', 'zero_area', f"{name} has zero or negative area")
+                continue
+            width, height = sizes[page]
+            if (x1 < -BOUNDS_TOLERANCE or y1 < -BOUNDS_TOLERANCE
+                    or x2 > width + BOUNDS_TOLERANCE or y2 > height + BOUNDS_TOLERANCE):
+                issue('error', 'bounds', f"{name} lies outside page {page} ({width:g} x {height:g})")
+                continue
+            boxes.append((name, page, x1, y1, x2, y2))
+    
+    for a, b in find_overlaps(boxes):
+        same_kind = a[0].split(' ')[0] == b[0].split(' ')[0]
+        depth = min(min(a[4], b[4]) - max(a[2], b[2]), min(a[5], b[5]) - max(a[3], b[3]))
+        level = 'error' if same_kind and depth > OVERLAP_TOLERANCE else 'warning'
+        issue(level, 'overlap', f"{a[0]} overlaps {b[0]} on page {a[1]} by {depth:.1f} pt")
+    
+    if mapping.get('save_profile', 'default') not in SAVE_PROFILES:
+        issue('error', 'save_profile', f"unknown save_profile '{mapping['save_profile']}'")
+    
+    fields = mapping.get('fields', {})
+    for number, field_name in mapping.get('field_numbers', {}).items():
+        if field_name not in fields:
+            issue('warning', 'field_number', f"field number {number} refers to missing field '{field_name}'")
+    
+    return issues
+
+def compile_mapping(mapping, source=None):
+    """
+    Build the runtime form of a linted mapping
+    
+    Coordinates become floats and a per-page index lists the fields and
+    condition boxes on each page, so filling a page skips everything else.
+    """
+    compiled = dict(mapping)
+    pages = {}
+    for section in ('fields', 'condition_boxes'):
+        entries = {}
+        for key, info in mapping.get(section, {}).items():
+            entries[key] = dict(info, coordinates=[float(v) for v in info['coordinates']], page=int(info['page']))
+            page = pages.setdefault(str(entries[key]['page']), {'fields': [], 'condition_boxes': []})
+            page[section].append(key)
+        compiled[section] = entries
+    compiled['pages'] = pages
+    compiled['compiled'] = {"version": COMPILED_VERSION, "source": source or {}}
+    return compiled
+
+def _source_stamps(pdf_template, mapping_file):
+    return {
+        "mapping": list(MappingCache._stamp(mapping_file)),
+        "template": list(MappingCache._stamp(pdf_template))
+    }
+
+def load_compiled_mapping(pdf_template, mapping_file):
+    """
+    Return the compiled mapping, reusing the .compiled.json written by
+    compile_mapping_file while it matches both source files
+    """
+    source = _source_stamps(pdf_template, mapping_file)
+    compiled_file = compiled_path(mapping_file)
+    if compiled_file.exists():
+        with open(compiled_file, 'r') as f:
+            compiled = json.load(f)
+        meta = compiled.get('compiled', {})
+        if meta.get('version') == COMPILED_VERSION and meta.get('source') == source:
+            return compiled
+    
+    with open(mapping_file, 'r') as f:
+        mapping = json.load(f)
+    issues = lint_mapping(mapping, page_sizes(pdf_template))
+    if any(issue['level'] == 'error' for issue in issues):
+        raise MappingError(mapping_file, issues)
+    return compile_mapping(mapping, source)
+
+def compile_mapping_file(mapping_file):
+    """
+    Lint one mapping against its template and write its .compiled.json if it passes
+    
+    Returns a report entry; module-level so it can run in a process pool.
+    """
+    mapping_file = Path(mapping_file)
+    pdf_template = mapping_file.with_suffix('.pdf')
+    report = {"mapping": mapping_file.name, "template": pdf_template.name, "ok": False, "issues": []}
+    if not pdf_template.exists():
+        report['issues'].append({"level": "error", "kind": "template", "message": f"Template not found: {pdf_template.name}"})
+        return report
+    try:
+        with open(mapping_file, 'r') as f:
+            mapping = json.load(f)
+        report['issues'] = lint_mapping(mapping, page_sizes(pdf_template))
+    except Exception as e:
+        report['issues'].append({"level": "error", "kind": "load", "message": str(e)})
+        return report
+    
+    report['ok'] = not any(issue['level'] == 'error' for issue in report['issues'])
+    compiled_file = compiled_path(mapping_file)
+    if report['ok']:
+        compiled = compile_mapping(mapping, _source_stamps(pdf_template, mapping_file))
+        with open(compiled_file, 'w') as f:
+            json.dump(compiled, f, indent=2)
+        report['compiled'] = compiled_file.name
+    elif compiled_file.exists():
+        # Never leave a stale runtime form behind for a mapping that now fails
+        compiled_file.unlink()
+    return report
+
+# Image formats accepted by render_output / render_filled, mapped to Pixmap.tobytes() names
+PREVIEW_FORMATS = {"png": "png", "jpeg": "jpg"}
+PREVIEW_DPI_RANGE = (18, 600)
+MAX_PREVIEW_PAGES = 10
+# Pixels rendered per preview request, about ten letter pages at 200 dpi
+MAX_PREVIEW_PIXELS = 40_000_000
+
+_render_filler = None
+
+def render_document_pages(source, pages, dpi, image_format):
+    """
+    Process-pool entry point for GeneralPDFFiller._render_missing
+
+    Each worker process keeps its own filler (and so its own mapping and
+    font caches) across calls.
+    """
+    global _render_filler
+    if _render_filler is None:
+        _render_filler = GeneralPDFFiller(output_dir=Path(__file__).parent / "output")
+    return _render_filler._render_missing(source, pages, dpi, image_format)
+
+class PreviewCache:
+    """LRU of rendered page images keyed by (content hash, page, dpi, format), bounded by total bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._images:
+                self._size -= len(self._images.pop(key))
+            self._images[key] = image
+            self._size += len(image)
+            while self._size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._size -= len(evicted)
+
+class PageOverlayCache:
+    """
+    Cache of drawn page overlays keyed by a hash of everything that lands on the page.
+
+    An overlay is a page holding only the text and highlights for a page. It
+    is built the second time a key is seen, so pages carrying record-specific
+    data, which never repeat, are drawn directly and never cached. All
+    overlays are pages of one shared document, so each embedded font is
+    stored once and show_pdf_page grafts it once per output. Pages cannot be
+    dropped without renumbering the rest, so a full cache starts a new
+    document. Overlays are plain fitz pages and, like the rest of the filler,
+    must not be used from two threads at once.
+    """
+
+    def __init__(self, max_overlays=256, max_seen=4096):
+        self.max_overlays = max_overlays
+        self.max_seen = max_seen
+        self._document = None
+        self._overlays = {}
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (document, page number, embedded_fonts) for a cached overlay, or None"""
+        with self._lock:
+            entry = self._overlays.get(key)
+            return None if entry is None else (self._document, *entry)
+
+    def seen(self, key):
+        """Record key and return True if it had been seen before"""
+        with self._lock:
+            repeat = key in self._seen
+            self._seen[key] = True
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            return repeat
+
+    def new_page(self, width, height):
+        """Add a blank page to the shared document; returns (document, page)"""
+        with self._lock:
+            if self._document is None or len(self._document) >= self.max_overlays:
+                # The old document is left to garbage collection rather than closed
+                self._document = _load_fitz().open()
+                self._overlays = {}
+            return self._document, self._document.new_page(width=width, height=height)
+
+    def put(self, key, document, page_number, embedded_fonts):
+        with self._lock:
+            # Skip overlays drawn into a document that has since been replaced
+            if document is self._document:
+                self._overlays[key] = (page_number, embedded_fonts)
+
 class GeneralPDFFiller:
-    def __init__(self, output_dir="output"):
+    def __init__(self, output_dir="output", mapping_cache=None, preview_cache=None, font_files=None,
+                 page_overlays=None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.mapping_cache = mapping_cache or MappingCache()
+        self.preview_cache = preview_cache or PreviewCache()
+        self.page_overlays = page_overlays or PageOverlayCache()
+        if font_files is None:
+            font_files = [f for f in os.environ.get(FONT_FILES_ENV, '').split(os.pathsep) if f]
+        self.font_files = list(font_files)
         
-    def fill_pdf(self, pdf_template, mapping_file, form_data, conditions_to_highlight, output_filename=None):
+    def fill_pdf(self, pdf_template, mapping_file, form_data, conditions_to_highlight, output_filename=None,
+                 save_profile=None, output_dir=None):
         """
         Fill PDF with provided data
         
@@ -27,28 +519,21 @@ class GeneralPDFFiller:
             form_data: Dictionary with field data (keys can be field names or numbers)
             conditions_to_highlight: List of condition numbers to highlight
             output_filename: Optional output filename
+            save_profile: Optional SAVE_PROFILES name; falls back to the
+                mapping's "save_profile", then "default"
+            output_dir: Optional directory overriding self.output_dir for this fill
         """
         try:
-            # Load mapping
-            with open(mapping_file, 'r') as f:
-                mapping = json.load(f)
+            mapping = self.mapping_cache.load_mapping(pdf_template, mapping_file)
             
-            # Open PDF
-            pdf_document = fitz.open(pdf_template)
+            # Reject an unknown profile before doing any fill work
+            profile = save_profile or mapping.get('save_profile', 'default')
+            if profile not in SAVE_PROFILES:
+                raise ValueError(f"Unknown save profile: {profile}")
             
-            # Process form data - convert numeric keys to field references
-            processed_data = self._process_form_data(form_data, mapping)
-            
-            # Fill each page
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                
-                # Fill regular fields
-                self._fill_fields(page, mapping.get('fields', {}), processed_data, page_num)
-                
-                # Highlight condition boxes
-                self._highlight_conditions(page, mapping.get('condition_boxes', {}), 
-                                         conditions_to_highlight, page_num)
+            pdf_document, embedded_fonts = self._fill_document(
+                pdf_template, mapping, form_data, conditions_to_highlight
+            )
             
             # Generate output filename if not provided
             if not output_filename:
@@ -57,17 +542,252 @@ class GeneralPDFFiller:
                 output_filename = f"{base_name}_filled_{timestamp}.pdf"
             
             # Save filled PDF
-            output_path = self.output_dir / output_filename
-            pdf_document.save(str(output_path))
+            output_path = Path(output_dir or self.output_dir) / output_filename
+            self._save_document(pdf_document, profile, str(output_path), embedded_fonts)
             pdf_document.close()
             
-            logger.info(f"PDF saved to: {output_path}")
+            logger.info(f"PDF saved to: {output_path} (save profile: {profile})")
             return str(output_path)
             
         except Exception as e:
             logger.error(f"Error filling PDF: {e}")
             raise
     
+    def _fill_document(self, pdf_template, mapping, form_data, conditions_to_highlight, memoize=True):
+        """
+        Open the template and draw all fields and conditions
+        
+        Returns (document, embedded_fonts); embedded_fonts is True when any
+        text needed a font beyond base-14 Helvetica. With memoize=False every
+        page is drawn directly and page_overlays is left untouched.
+        """
+        pdf_document = _load_fitz().open(pdf_template)
+        
+        # Process form data - convert numeric keys to field references
+        processed_data = self._process_form_data(form_data, mapping)
+        
+        # Mapping fonts are relative to the template's folder
+        template_dir = Path(pdf_template).parent
+        font_chain = get_font_chain(
+            [template_dir / f for f in mapping.get('fonts', [])] + self.font_files
+        )
+        
+        # Identifies the template, mapping and fonts for page overlay keys
+        source = mapping.get('compiled', {}).get('source')
+        template_id = [str(pdf_template), source, self.font_files] if source else None
+        
+        # Fill only the pages the compiled mapping lists
+        fields = mapping.get('fields', {})
+        condition_boxes = mapping.get('condition_boxes', {})
+        highlighted = self._condition_numbers(conditions_to_highlight)
+        embedded_fonts = False
+        stamps = []
+        for page_key, page_index in mapping.get('pages', {}).items():
+            page_num = int(page_key)
+            values = {name: str(processed_data[name]) for name in page_index['fields'] if name in processed_data}
+            page_boxes = [num for num in page_index['condition_boxes'] if num in highlighted]
+            if not values and not page_boxes:
+                continue
+            
+            page = pdf_document[page_num]
+            page_fields = {name: fields[name] for name in values}
+            boxes = [condition_boxes[num] for num in page_boxes]
+            
+            # Rotated pages are drawn directly; an overlay would need the rotation undone
+            if not memoize or template_id is None or page.rotation:
+                embedded_fonts |= self._draw_page(page, page_fields, values, boxes, page_num, font_chain)
+                continue
+            
+            # Reuse the overlay for a page whose values and conditions repeat
+            key = hashlib.sha256(json.dumps(
+                [template_id, page_num, values, page_boxes], sort_keys=True, default=str
+            ).encode('utf-8')).hexdigest()
+            cached = self.page_overlays.get(key)
+            if cached is None and self.page_overlays.seen(key):
+                overlay, overlay_page = self.page_overlays.new_page(page.rect.width, page.rect.height)
+                overlay_fonts = self._draw_page(overlay_page, page_fields, values, boxes, page_num, font_chain)
+                cached = (overlay, overlay_page.number, overlay_fonts)
+                self.page_overlays.put(key, *cached)
+            
+            if cached is not None:
+                stamps.append((page, cached))
+            else:
+                embedded_fonts |= self._draw_page(page, page_fields, values, boxes, page_num, font_chain)
+        
+        # Stamp only once every overlay is drawn: show_pdf_page keeps a graft
+        # map per overlay document, which goes stale if the document grows
+        for page, (overlay, overlay_page_num, overlay_fonts) in stamps:
+            page.show_pdf_page(page.rect, overlay, overlay_page_num)
+            embedded_fonts |= overlay_fonts
+        
+        return pdf_document, embedded_fonts
+    
+    def _draw_page(self, page, page_fields, values, boxes, page_num, font_chain):
+        """Draw field text, then condition highlights, onto a page; returns True if fonts were embedded"""
+        embedded_fonts = self._fill_fields(page, page_fields, values, page_num, font_chain)
+        for box_info in boxes:
+            self._highlight_box(page, box_info)
+        return embedded_fonts
+    
+    def _save_document(self, pdf_document, profile, output_path=None, embedded_fonts=False):
+        """
+        Save with the named profile; returns the PDF bytes when output_path is None
+        
+        Embedded fonts are always subset, whatever the profile, so one CJK
+        character does not carry the whole fallback font into the output, and
+        compressed. Garbage collection is raised to 4 so a font drawn on the
+        page and grafted in from an overlay is stored once.
+        """
+        options = dict(SAVE_PROFILES[profile])
+        if options.pop('subset_fonts', False) or embedded_fonts:
+            pdf_document.subset_fonts()
+        if embedded_fonts:
+            options['garbage'] = max(options.get('garbage', 0), 4)
+            options['deflate_fonts'] = True
+        if output_path is None:
+            return pdf_document.tobytes(**options)
+        pdf_document.save(output_path, **options)
+    
+    def benchmark_save_profiles(self, pdf_template, mapping_file, form_data=None, conditions_to_highlight=None):
+        """
+        Fill the template once per save profile and report output size and save time
+        
+        Without form_data every field is filled with its own name, and without
+        conditions every condition box is highlighted. Page overlays are
+        bypassed so every profile saves the same directly drawn document.
+        """
+        mapping = self.mapping_cache.load_mapping(pdf_template, mapping_file)
+        if form_data is None:
+            form_data = {name: name for name in mapping.get('fields', {})}
+        if conditions_to_highlight is None:
+            conditions_to_highlight = list(mapping.get('condition_boxes', {}))
+        
+        results = []
+        for profile in SAVE_PROFILES:
+            pdf_document, embedded_fonts = self._fill_document(
+                pdf_template, mapping, form_data, conditions_to_highlight, memoize=False
+            )
+            start = time.perf_counter()
+            data = self._save_document(pdf_document, profile, embedded_fonts=embedded_fonts)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            pdf_document.close()
+            results.append({"profile": profile, "bytes": len(data), "save_ms": round(elapsed_ms, 1)})
+        return results
+    
+    def check_page_overlays(self, pdf_template, mapping_file, form_data=None, conditions_to_highlight=None, fills=3):
+        """
+        Fill the template `fills` times with identical inputs and compare each
+        page's text to a fill drawn without overlays; returns a list of problems
+        
+        Repeated fills build overlays on the second fill and stamp cached ones
+        after, so a multi-page template exercises every overlay path.
+        """
+        mapping = self.mapping_cache.load_mapping(pdf_template, mapping_file)
+        if form_data is None:
+            form_data = {name: name for name in mapping.get('fields', {})}
+        if conditions_to_highlight is None:
+            conditions_to_highlight = list(mapping.get('condition_boxes', {}))
+        
+        def page_texts(memoize):
+            pdf_document, _ = self._fill_document(
+                pdf_template, mapping, form_data, conditions_to_highlight, memoize=memoize
+            )
+            with _load_fitz().open("pdf", pdf_document.tobytes()) as saved:
+                texts = [page.get_text() for page in saved]
+            pdf_document.close()
+            return texts
+        
+        expected = page_texts(memoize=False)
+        problems = []
+        for fill in range(1, fills + 1):
+            try:
+                texts = page_texts(memoize=True)
+            except Exception as e:
+                problems.append(f"fill {fill} failed: {e}")
+                continue
+            for page_num, (got, want) in enumerate(zip(texts, expected)):
+                if got != want:
+                    problems.append(f"fill {fill} page {page_num}: text differs from a direct fill")
+        return problems
+    
+    def render_output(self, pdf_path, pages=None, dpi=100, image_format="png", executor=None):
+        """
+        Rasterize pages of an already filled PDF; returns a list of (page, image bytes)
+        
+        Cache misses are rendered in executor (e.g. a ProcessPoolExecutor) if given.
+        """
+        with open(pdf_path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        return self._render_pages(content_hash, ("output", str(pdf_path)), pages, dpi, image_format, executor)
+    
+    def render_filled(self, pdf_template, mapping_file, form_data, conditions_to_highlight,
+                      pages=None, dpi=100, image_format="png", executor=None):
+        """Fill in memory and rasterize pages without saving; returns a list of (page, image bytes)"""
+        # The fill is deterministic, so its inputs identify the output
+        content_hash = hashlib.sha256(json.dumps([
+            str(pdf_template), MappingCache._stamp(pdf_template),
+            str(mapping_file), MappingCache._stamp(mapping_file),
+            form_data, conditions_to_highlight, self.font_files
+        ], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        source = ("filled", str(pdf_template), str(mapping_file), form_data, conditions_to_highlight, self.font_files)
+        return self._render_pages(content_hash, source, pages, dpi, image_format, executor)
+    
+    def _render_pages(self, content_hash, source, pages, dpi, image_format, executor):
+        """Return cached page images, rendering only the misses"""
+        if image_format not in PREVIEW_FORMATS:
+            raise ValueError(f"Unsupported preview format: {image_format}")
+        low, high = PREVIEW_DPI_RANGE
+        if not low <= dpi <= high:
+            raise ValueError(f"dpi must be between {low} and {high}")
+        pages = [0] if pages is None else list(dict.fromkeys(int(p) for p in pages))
+        if len(pages) > MAX_PREVIEW_PAGES:
+            raise ValueError(f"At most {MAX_PREVIEW_PAGES} pages per preview")
+        
+        images = {}
+        for page_num in pages:
+            images[page_num] = self.preview_cache.get((content_hash, page_num, dpi, image_format))
+        
+        missing = [p for p in pages if images[p] is None]
+        if missing:
+            if executor is None:
+                rendered = self._render_missing(source, missing, dpi, image_format)
+            else:
+                rendered = executor.submit(render_document_pages, source, missing, dpi, image_format).result()
+            for page_num, image in rendered.items():
+                images[page_num] = image
+                self.preview_cache.put((content_hash, page_num, dpi, image_format), image)
+        
+        return [(page_num, images[page_num]) for page_num in pages]
+    
+    def _render_missing(self, source, pages, dpi, image_format):
+        """Open the output, or fill the template in memory, and rasterize pages"""
+        if source[0] == "output":
+            pdf_document = _load_fitz().open(source[1])
+        else:
+            _, pdf_template, mapping_file, form_data, conditions_to_highlight, font_files = source
+            self.font_files = list(font_files)
+            mapping = self.mapping_cache.load_mapping(pdf_template, mapping_file)
+            pdf_document, _ = self._fill_document(pdf_template, mapping, form_data, conditions_to_highlight)
+        
+        try:
+            pixels = 0
+            for page_num in pages:
+                if not 0 <= page_num < len(pdf_document):
+                    raise ValueError(f"Page {page_num} out of range (document has {len(pdf_document)} pages)")
+                rect = pdf_document[page_num].rect
+                pixels += (rect.width * dpi / 72) * (rect.height * dpi / 72)
+            if pixels > MAX_PREVIEW_PIXELS:
+                raise ValueError(f"Preview too large: {pixels / 1e6:.0f} megapixels "
+                                 f"(limit {MAX_PREVIEW_PIXELS / 1e6:.0f}); lower dpi or request fewer pages")
+            
+            images = {}
+            for page_num in pages:
+                pixmap = pdf_document[page_num].get_pixmap(dpi=dpi)
+                images[page_num] = pixmap.tobytes(PREVIEW_FORMATS[image_format])
+            return images
+        finally:
+            pdf_document.close()
+    
     def _process_form_data(self, form_data, mapping):
         """Process form data, converting numeric references to field names"""
         processed = {}
@@ -84,27 +804,37 @@ class GeneralPDFFiller:
         
         return processed
     
-    def _fill_fields(self, page, fields, form_data, page_num):
-        """Fill regular fields on the page"""
+    def _fill_fields(self, page, fields, form_data, page_num, font_chain):
+        """
+        Lay out every field on the page and draw it
+        
+        Runs base-14 Helvetica covers are written as plain page text, which
+        embeds nothing; the rest share one TextWriter. Returns True if the
+        writer was used, i.e. the page now embeds fonts.
+        """
+        writer = fitz.TextWriter(page.rect)
+        embedded_fonts = False
         for field_name, field_info in fields.items():
             if field_info['page'] == page_num and field_name in form_data:
-                self._add_text_to_field(page, field_info, str(form_data[field_name]))
+                embedded_fonts |= self._add_text_to_field(page, writer, font_chain, field_info,
+                                                          str(form_data[field_name]))
+        if embedded_fonts:
+            writer.write_text(page, color=(0, 0, 0))
+        return embedded_fonts
     
-    def _highlight_conditions(self, page, condition_boxes, conditions_to_highlight, page_num):
-        """Highlight condition boxes on the page"""
+    def _condition_numbers(self, conditions_to_highlight):
+        """Normalize requested conditions to condition_boxes keys"""
+        numbers = set()
         for condition in conditions_to_highlight:
             # Handle both numeric and string format (e.g., 5 or "5c")
             if isinstance(condition, str) and condition.endswith('c'):
-                condition_num = condition[:-1]
+                numbers.add(condition[:-1])
             else:
-                condition_num = str(condition)
-            
-            box_info = condition_boxes.get(condition_num)
-            if box_info and box_info['page'] == page_num:
-                self._highlight_box(page, box_info)
+                numbers.add(str(condition))
+        return numbers
     
-    def _add_text_to_field(self, page, field_info, text):
-        """Add text to a field with proper formatting using textbox for wrapping"""
+    def _add_text_to_field(self, page, writer, font_chain, field_info, text):
+        """Wrap text into the field, shrinking the font until it fits; returns True if the writer was used"""
         coords = field_info['coordinates']
         # Start with smaller font size for better fitting
         initial_font_size = field_info.get('font_size', 6)  # Default to 6pt
@@ -112,78 +842,41 @@ class GeneralPDFFiller:
         x1, y1, x2, y2 = coords
         
         # Create rectangle with small padding
-        rect = fitz.Rect(
-            x1 + 2,  # Small left padding
-            y1 + 2,  # Small top padding
-            x2 - 2,  # Small right padding
-            y2 - 2   # Small bottom padding
-        )
+        rect = fitz.Rect(x1 + 2, y1 + 2, x2 - 2, y2 - 2)
         
-        # Try to insert text with automatic wrapping, reducing font size if needed
+        # Try progressively smaller font sizes until the wrapped lines fit;
+        # widths are per point, so layout happens at unit size
         fontsize = initial_font_size
-        rc = -1
+        while True:
+            max_width = rect.width / fontsize
+            lines = font_chain.wrap(text, max_width)
+            max_lines = int(rect.height // (fontsize * font_chain.line_height))
+            if len(lines) <= max_lines or fontsize - FONT_SIZE_STEP < MIN_FONT_SIZE:
+                break
+            fontsize -= FONT_SIZE_STEP
         
-        # Try progressively smaller font sizes until text fits
-        while rc < 0 and fontsize >= 4:
-            try:
-                rc = page.insert_textbox(
-                    rect,
-                    text,
-                    fontsize=fontsize,
-                    fontname="helv",
-                    color=(0, 0, 0),
-                    align=fitz.TEXT_ALIGN_LEFT if hasattr(fitz, 'TEXT_ALIGN_LEFT') else 0
-                )
-                
-                if rc < 0:
-                    fontsize -= 0.5
-                    
-            except Exception as e:
-                logger.error(f"Error with font size {fontsize}: {e}")
-                fontsize -= 0.5
-        
-        # If text still doesn't fit after trying smaller fonts
-        if rc < 0:
+        # If text still doesn't fit at the smallest size, truncate with an ellipsis
+        if len(lines) > max_lines:
             logger.warning(f"Text overflow in field '{field_info.get('name', 'unknown')}' even at font size {fontsize}")
-            # Try to truncate and add ellipsis
-            truncated = self._truncate_text(text, rect, page, fontsize)
-            try:
-                page.insert_textbox(
-                    rect,
-                    truncated,
-                    fontsize=fontsize,
-                    fontname="helv",
-                    color=(0, 0, 0),
-                    align=fitz.TEXT_ALIGN_LEFT if hasattr(fitz, 'TEXT_ALIGN_LEFT') else 0
-                )
-            except Exception as e:
-                logger.error(f"Failed to insert truncated text: {e}")
-                # Final fallback - simple text insertion
-                y_center = y1 + (y2 - y1) / 2 + fontsize / 3
-                page.insert_text(
-                    (x1 + 2, y_center),
-                    text[:50] + "..." if len(text) > 50 else text,
-                    fontsize=fontsize,
-                    color=(0, 0, 0)
-                )
-    
-    def _truncate_text(self, text, rect, page, fontsize):
-        """Truncate text to fit within rectangle"""
-        # Try progressively shorter text until it fits
-        truncated = text
-        while len(truncated) > 10:
-            test_text = truncated[:-10] + "..."
-            rc = page.insert_textbox(
-                rect,
-                test_text,
-                fontname="helv",
-                fontsize=fontsize,
-                align=fitz.TEXT_ALIGN_LEFT if hasattr(fitz, 'TEXT_ALIGN_LEFT') else 0
-            )
-            if rc >= 0:
-                return test_text
-            truncated = truncated[:-10]
-        return truncated[:10] + "..."
+            lines = lines[:max(max_lines, 1)]
+            lines[-1] = font_chain.ellipsize(lines[-1], max_width)
+        
+        line_height = fontsize * font_chain.line_height
+        baseline = rect.y0 + fontsize * font_chain.ascender
+        used_writer = False
+        for line in lines:
+            x = rect.x0
+            for font, run, width, base14 in font_chain.runs(line):
+                if base14:
+                    # Base-14 text is written as WinAnsi bytes, so pass the cp1252 codes
+                    winansi = run.encode('cp1252', errors='replace').decode('latin-1')
+                    page.insert_text((x, baseline), winansi, fontname="helv", fontsize=fontsize, color=(0, 0, 0))
+                else:
+                    writer.append((x, baseline), run, font=font, fontsize=fontsize)
+                    used_writer = True
+                x += width * fontsize
+            baseline += line_height
+        return used_writer
     
     def _highlight_box(self, page, box_info):
         """Highlight a condition box"""
@@ -202,8 +895,34 @@ class GeneralPDFFiller:
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    parser = argparse.ArgumentParser(description="General PDF form filler")
+    parser.add_argument('--benchmark-save', nargs=2, metavar=('TEMPLATE', 'MAPPING'),
+                        help="Report output size and save time for each save profile")
+    parser.add_argument('--check-overlays', nargs=2, metavar=('TEMPLATE', 'MAPPING'),
+                        help="Fill three times with identical data and check the cached page overlays")
+    args = parser.parse_args()
+    
     filler = GeneralPDFFiller()
     
+    if args.benchmark_save:
+        results = filler.benchmark_save_profiles(*args.benchmark_save)
+        print(f"{'profile':<10} {'bytes':>12} {'save ms':>10}")
+        for row in results:
+            print(f"{row['profile']:<10} {row['bytes']:>12,} {row['save_ms']:>10.1f}")
+        raise SystemExit(0)
+    
+    if args.check_overlays:
+        problems = filler.check_page_overlays(*args.check_overlays)
+        for problem in problems:
+            print(problem)
+        print("Page overlays OK" if not problems else f"{len(problems)} problem(s)")
+        raise SystemExit(1 if problems else 0)
+    
     # Example form data
     form_data = {
         "name": "John Doe",
@@ -1,11 +1,14 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox, simpledialog, ttk
-import fitz
-from PIL import Image, ImageTk
+import argparse
 import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import math
+from pathlib import Path
+
+# PyMuPDF is loaded through pdf_filler on first use, so the headless
+# --compile path only imports it in the worker processes that need it
+from pdf_filler import _load_fitz, compile_mapping_file, lint_mapping
 
 class PDFFieldMapper:
     def __init__(self, root):
@@ -94,7 +97,7 @@ class PDFFieldMapper:
         
         if file_path:
             self.pdf_path = file_path
-            self.pdf_document = fitz.open(file_path)
+            self.pdf_document = _load_fitz().open(file_path)
             self.current_page = 0
             self.display_page()
             self.status_bar.config(text=f"Loaded: {os.path.basename(file_path)}")
@@ -104,7 +107,7 @@ class PDFFieldMapper:
             return
             
         page = self.pdf_document[self.current_page]
-        mat = fitz.Matrix(self.zoom_level, self.zoom_level)
+        mat = _load_fitz().Matrix(self.zoom_level, self.zoom_level)
         pix = page.get_pixmap(matrix=mat)
         img_data = pix.tobytes("ppm")
         
@@ -403,8 +406,9 @@ class PDFFieldMapper:
                 }
                 self.display_page()
         else:
-            next_num = len([b for b in self.condition_boxes.values() 
-                          if b['page'] == self.current_page]) + 1
+            # Numbers are unique across all pages; counting only this page's
+            # boxes reused numbers from other pages and overwrote them
+            next_num = max(self.condition_boxes, default=0) + 1
             
             self.condition_boxes[next_num] = {
                 'coordinates': [pdf_x1, pdf_y1, pdf_x2, pdf_y2],
@@ -474,8 +478,14 @@ class PDFFieldMapper:
             
             with open(file_path, 'w') as f:
                 json.dump(mapping_data, f, indent=2)
-                
-            messagebox.showinfo("Success", f"Mapping saved as {os.path.basename(file_path)}")
+            
+            sizes = [(page.rect.width, page.rect.height) for page in self.pdf_document]
+            problems = [issue['message'] for issue in lint_mapping(mapping_data, sizes)]
+            if problems:
+                messagebox.showwarning("Mapping Problems",
+                                       f"Saved as {os.path.basename(file_path)}, but:\n\n" + "\n".join(problems[:15]))
+            else:
+                messagebox.showinfo("Success", f"Mapping saved as {os.path.basename(file_path)}")
             
     def load_mapping(self):
         default_dir = os.path.join(os.path.dirname(__file__), "blanks_and_json")
@@ -501,7 +511,49 @@ class PDFFieldMapper:
             self.condition_boxes = {}
             self.display_page()
 
+def compile_all(mapping_dir, workers=None):
+    """
+    Lint and compile every mapping in mapping_dir in parallel
+    
+    Writes <target>.compiled.json for each passing mapping and
+    compile_report.json for all of them; returns True if every mapping passed.
+    """
+    mapping_dir = Path(mapping_dir)
+    if not mapping_dir.is_dir():
+        raise NotADirectoryError(f"Mapping folder not found: {mapping_dir}")
+    mapping_files = sorted(p for p in mapping_dir.glob("*.json")
+                           if not p.name.endswith(".compiled.json") and p.name != "compile_report.json")
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        reports = list(pool.map(compile_mapping_file, mapping_files))
+    
+    with open(mapping_dir / "compile_report.json", 'w') as f:
+        json.dump({"created_date": datetime.now().isoformat(), "mappings": reports}, f, indent=2)
+    
+    for report in reports:
+        print(f"{'OK  ' if report['ok'] else 'FAIL'} {report['mapping']}")
+        for issue in report['issues']:
+            print(f"     {issue['level']}: {issue['message']}")
+    passed = sum(report['ok'] for report in reports)
+    print(f"{passed}/{len(reports)} mappings passed; report: {mapping_dir / 'compile_report.json'}")
+    return passed == len(reports)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="General PDF Field Mapper")
+    parser.add_argument('--compile', nargs='?', const=os.path.join(os.path.dirname(os.path.abspath(__file__)), "blanks_and_json"),
+                        metavar='DIR', help="Lint and compile all mappings headless (default: blanks_and_json)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    
+    if args.compile:
+        sys.exit(0 if compile_all(args.compile, args.workers) else 1)
+    
+    # The GUI stack is imported only here, so --compile and its worker
+    # processes (which re-import this module) run without tkinter or PIL
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, simpledialog
+    from PIL import Image, ImageTk
+    
     root = tk.Tk()
     app = PDFFieldMapper(root)
     root.mainloop()
\ No newline at end of file